@@ -1,9 +1,25 @@
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import pandas as pd
 from dataclasses import dataclass
 from config import config
+import asyncio
 import time
+from collections import deque
+
+# Price multipliers per action; anything else (e.g. 'hold') keeps the current price
+_STOP_LOSS_MULTIPLIER = {
+    'buy': 1 - config.STOP_LOSS_PERCENTAGE,
+    'sell': 1 + config.STOP_LOSS_PERCENTAGE
+}
+_TAKE_PROFIT_MULTIPLIER = {
+    'buy': 1 + config.TAKE_PROFIT_PERCENTAGE,
+    'sell': 1 - config.TAKE_PROFIT_PERCENTAGE
+}
+
+# Agents size positions against a fixed notional portfolio; fold its base size once
+DEFAULT_PORTFOLIO_VALUE = 100000.0
+_DEFAULT_BASE_SIZE = DEFAULT_PORTFOLIO_VALUE * config.MAX_POSITION_SIZE
 
 @dataclass
 class TradingSignal:
@@ -19,8 +35,19 @@ class BaseAgent(ABC):
     def __init__(self, name: str):
         self.name = name
         self.signals_generated = 0
-        self.total_confidence = 0.0
-        self.performance_history = []
+        self.avg_confidence = 0.0
+        self.performance_history = deque(maxlen=100)  # Keep only last 100 signals
+        self.action_counts = {'buy': 0, 'sell': 0, 'hold': 0}
+        self.ai_cache_hits = 0
+        self.ai_cache_misses = 0
+        
+        # Choose the AI path once from the configured providers so every call takes the same branch
+        if config.GEMINI_API_KEY:
+            self._ai_impl = self._run_ai_analysis
+        elif config.OPENAI_API_KEY:
+            self._ai_impl = self._run_openai_analysis
+        else:
+            self._ai_impl = self._ai_unavailable
     
     @abstractmethod
     async def analyze(self, symbol: str, data: pd.DataFrame, market_data: Dict) -> TradingSignal:
@@ -30,55 +57,116 @@ class BaseAgent(ABC):
     def record_signal(self, signal: TradingSignal):
         """Record signal for performance tracking"""
         self.signals_generated += 1
-        self.total_confidence += signal.confidence
+        # Running mean keeps the average current without re-summing on every metrics call
+        self.avg_confidence += (signal.confidence - self.avg_confidence) / self.signals_generated
+        
+        # The deque drops its oldest entry on append once full; keep the counts in step
+        if len(self.performance_history) == self.performance_history.maxlen:
+            evicted = self.performance_history[0]['action']
+            self.action_counts[evicted] = self.action_counts.get(evicted, 0) - 1
         self.performance_history.append({
             'timestamp': time.time(),
             'symbol': signal.symbol,
             'action': signal.action,
             'confidence': signal.confidence
         })
-        
-        # Keep only last 100 signals
-        if len(self.performance_history) > 100:
-            self.performance_history = self.performance_history[-100:]
+        self.action_counts[signal.action] = self.action_counts.get(signal.action, 0) + 1
     
     def get_performance_metrics(self) -> Dict:
         """Get performance metrics for this agent"""
         return {
             'total_signals': self.signals_generated,
-            'avg_confidence': self.total_confidence / max(1, self.signals_generated),
+            'avg_confidence': self.avg_confidence,
             'recent_signals': len(self.performance_history),
-            'last_signal_time': self.performance_history[-1]['timestamp'] if self.performance_history else None
+            'recent_buy_signals': self.action_counts.get('buy', 0),
+            'recent_sell_signals': self.action_counts.get('sell', 0),
+            'recent_hold_signals': self.action_counts.get('hold', 0),
+            'last_signal_time': self.performance_history[-1]['timestamp'] if self.performance_history else None,
+            'ai_cache_hits': self.ai_cache_hits,
+            'ai_cache_misses': self.ai_cache_misses
         }
     
-    async def _get_ai_analysis(self, prompt: str) -> str:
+    async def _get_ai_analysis(self, prompt: str, cache_key: Optional[tuple] = None) -> str:
+        """Get AI analysis, served from the response cache when the prompt (or cache_key) was seen recently."""
+        from services.cache_service import llm_cache
+        cached = llm_cache.get(prompt, cache_key)
+        if cached is not None:
+            self.ai_cache_hits += 1
+            return cached
+
+        self.ai_cache_misses += 1
+        from llm_service import llm_breaker
+        if llm_breaker.is_open():
+            return "AI analysis unavailable: LLM providers are failing, retrying shortly"
+
+        analysis, answered = await self._ai_impl(prompt)
+        # Only real provider answers are cached; errors and outages are retried on the next call
+        if answered:
+            llm_cache.set(prompt, analysis, cache_key)
+        return analysis
+    
+    async def _run_ai_analysis(self, prompt: str) -> Tuple[str, bool]:
         """Get AI analysis using Gemini, Groq, and ChatGPT, validated by Gemini."""
         try:
-            from llm_service import multi_llm_analysis, validate_with_gemini
-            llm_results = await multi_llm_analysis(prompt)
-            # validate_with_gemini is still sync, but we want it async
-            # So let's call Gemini validation using ask_gemini async
-            from llm_service import ask_gemini
-            validation_prompt = (
-                f"Given the following stock analysis responses from different AI models for the prompt:\n"
-                f'"{prompt}"\n\n'
-                f"Responses:\n"
-                + "\n".join([f"{k}: {v}" for k, v in llm_results.items()])
-                + "\n\n"
-                "Please validate each response for accuracy and reasonableness. "
-                "Summarize the best action and highlight any disagreements or errors."
-            )
-            validation = await ask_gemini(validation_prompt)
-            chatgpt_response = llm_results.get("chatgpt")
-            chatgpt_note = f"\n\nChatGPT (OpenAI) Response:\n{chatgpt_response}" if chatgpt_response else ""
-            return (
-                f"Gemini Validation (Google):\n{validation}\n"
-                f"\nRaw LLM Responses (Gemini, Groq, ChatGPT):\n"
-                + "\n".join([f"{k}: {v}" for k, v in llm_results.items()])
-                + chatgpt_note
-            )
+            return await self._multi_llm_analysis(prompt)
         except Exception as e:
-            return f"AI analysis error: {str(e)}"
+            return f"AI analysis error: {str(e)}", False
+    
+    async def _run_openai_analysis(self, prompt: str) -> Tuple[str, bool]:
+        """Get AI analysis from ChatGPT alone when no Gemini key is configured."""
+        from llm_service import ask_chatgpt, llm_breaker
+        try:
+            answer = await ask_chatgpt(prompt)
+        except Exception as e:
+            print("ask_chatgpt error", str(e))
+            llm_breaker.record_failure()
+            return f"AI analysis error: ChatGPT error: {str(e)}", False
+        llm_breaker.record_success()
+        return f"ChatGPT (OpenAI) Response:\n{answer}", True
+    
+    async def _ai_unavailable(self, prompt: str) -> Tuple[str, bool]:
+        """Fallback when no LLM provider is configured."""
+        return "AI analysis unavailable: no LLM API key configured", False
+    
+    async def _multi_llm_analysis(self, prompt: str) -> Tuple[str, bool]:
+        """Ask every configured provider at once, then have Gemini validate the answers; the flag is False if none answered."""
+        from llm_service import ask_gemini, ask_groq, ask_chatgpt, build_validation_prompt, llm_breaker
+        # Fire every provider at once so the wait is the slowest call, not the sum
+        tasks = {"gemini": asyncio.create_task(ask_gemini(prompt))}
+        if config.GROQ_API_KEY:
+            tasks["groq"] = asyncio.create_task(ask_groq(prompt))
+        if config.OPENAI_API_KEY:
+            tasks["chatgpt"] = asyncio.create_task(ask_chatgpt(prompt))
+        results = await asyncio.gather(*tasks.values(), return_exceptions=True)
+        llm_results = {k: (v if not isinstance(v, Exception) else f"error: {v}") for k, v in zip(tasks.keys(), results)}
+        answered = [v for v in results if not isinstance(v, Exception)]
+        # One outcome per request: the breaker trips only when every provider failed
+        if answered:
+            llm_breaker.record_success()
+        else:
+            llm_breaker.record_failure()
+
+        # Validation needs the provider answers, so it can only start once they are in.
+        # With a single answer there is nothing to cross-check, so skip the extra round-trip.
+        if len(answered) > 1:
+            header = "Gemini Validation (Google):"
+            validation = await ask_gemini(build_validation_prompt(llm_results, prompt))
+        elif answered:
+            provider = next(k for k, v in zip(tasks.keys(), results) if not isinstance(v, Exception))
+            header = f"Single provider response ({provider}):"
+            validation = answered[0]
+        else:
+            header = "No validation:"
+            validation = "No LLM provider returned a response"
+
+        chatgpt_response = llm_results.get("chatgpt")
+        chatgpt_note = f"\n\nChatGPT (OpenAI) Response:\n{chatgpt_response}" if chatgpt_response else ""
+        return (
+            f"{header}\n{validation}"
+            f"\n\nRaw LLM Responses (Gemini, Groq, ChatGPT):\n"
+            + "\n".join([f"{k}: {v}" for k, v in llm_results.items()])
+            + chatgpt_note
+        ), bool(answered)
     
     def _calculate_position_size(self, confidence: float, portfolio_value: float) -> float:
         """Calculate position size based on confidence and risk tolerance"""
@@ -86,18 +174,14 @@ class BaseAgent(ABC):
         risk_adjusted_size = base_size * confidence
         return risk_adjusted_size
     
+    def _default_position_size(self, confidence: float) -> float:
+        """Position size for the default portfolio value"""
+        return _DEFAULT_BASE_SIZE * confidence
+    
     def _calculate_stop_loss(self, current_price: float, action: str) -> float:
         """Calculate stop loss price"""
-        if action == 'buy':
-            return current_price * (1 - config.STOP_LOSS_PERCENTAGE)
-        elif action == 'sell':
-            return current_price * (1 + config.STOP_LOSS_PERCENTAGE)
-        return current_price
+        return current_price * _STOP_LOSS_MULTIPLIER.get(action, 1.0)
     
     def _calculate_take_profit(self, current_price: float, action: str) -> float:
         """Calculate take profit price"""
-        if action == 'buy':
-            return current_price * (1 + config.TAKE_PROFIT_PERCENTAGE)
-        elif action == 'sell':
-            return current_price * (1 - config.TAKE_PROFIT_PERCENTAGE)
-        return current_price 
\ No newline at end of file
+        return current_price * _TAKE_PROFIT_MULTIPLIER.get(action, 1.0) 
\ No newline at end of file
@@ -0,0 +1,155 @@
+import numpy as np
+from numba import njit
+
+TRADING_DAYS = 252.0
+ATR_WINDOW = 14
+
+# Weights of each component in the overall portfolio risk score
+CONCENTRATION_WEIGHT = 0.25
+SECTOR_WEIGHT = 0.20
+POSITION_WEIGHT = 0.20
+VOLATILITY_WEIGHT = 0.20
+CORRELATION_WEIGHT = 0.15
+
+@njit(cache=True)
+def volatility_kernel(close, high, low, atr_window):
+    """Annualized return volatility and ATR/price ratio in one pass over contiguous float64 arrays.
+
+    Returns NaN for either measure when there is not enough data. Pass empty
+    high/low arrays to skip the ATR computation.
+    """
+    n = close.shape[0]
+
+    # Welford running variance over simple returns (NaN returns skipped like dropna)
+    count = 0
+    mean = 0.0
+    m2 = 0.0
+    for i in range(1, n):
+        r = close[i] / close[i - 1] - 1.0
+        if np.isfinite(r):
+            count += 1
+            delta = r - mean
+            mean += delta / count
+            m2 += delta * (r - mean)
+    std_vol = np.sqrt(m2 / (count - 1)) * np.sqrt(TRADING_DAYS) if count > 1 else np.nan
+
+    # Average True Range over the last atr_window bars, relative to the last close
+    atr_vol = np.nan
+    if high.shape[0] == n and low.shape[0] == n and n >= atr_window:
+        total = 0.0
+        for i in range(n - atr_window, n):
+            tr = high[i] - low[i]
+            if i > 0:
+                tr = max(tr, abs(high[i] - close[i - 1]), abs(low[i] - close[i - 1]))
+            total += tr
+        atr_vol = total / atr_window / close[n - 1]
+
+    return std_vol, atr_vol
+
+@njit(cache=True)
+def risk_metrics_kernel(close, high, low, position_values, total_value, cash_balance,
+                        correlation_hits, max_sector_allocation, sector_limit):
+    """All risk-agent metrics in one call.
+
+    Returns (concentration, sector, position, volatility, correlation,
+    portfolio, cash_ratio), each on a 0-1 scale except cash_ratio.
+    """
+    cash_ratio = cash_balance / total_value if total_value > 0 else 1.0
+
+    # Normalized Herfindahl-Hirschman Index (1 = single position, 0 = equal weights)
+    n = position_values.shape[0]
+    if n == 0 or total_value <= 0:
+        concentration = 0.0
+    elif n == 1:
+        concentration = 1.0
+    else:
+        hhi = 0.0
+        for i in range(n):
+            weight = position_values[i] / total_value
+            hhi += weight * weight
+        concentration = max(0.0, min(1.0, (hhi - 1.0 / n) / (1.0 - 1.0 / n)))
+
+    sector = min(1.0, max_sector_allocation / sector_limit)
+
+    std_vol, atr_vol = volatility_kernel(close, high, low, ATR_WINDOW)
+
+    # 50% annualized volatility = max position risk; no data = max risk
+    position = 1.0 if np.isnan(std_vol) else min(1.0, std_vol / 0.5)
+
+    # Blend of return volatility and ATR; 60% = max risk, medium risk without enough data
+    if close.shape[0] < 20:
+        volatility = 0.5
+    else:
+        if np.isnan(atr_vol):
+            atr_vol = std_vol
+        volatility = min(1.0, (std_vol + atr_vol) / 2 / 0.6)
+
+    correlation = min(1.0, 0.2 * correlation_hits)
+
+    risk_score = (CONCENTRATION_WEIGHT * concentration + SECTOR_WEIGHT * sector
+                  + POSITION_WEIGHT * position + VOLATILITY_WEIGHT * volatility
+                  + CORRELATION_WEIGHT * correlation)
+    # More cash = lower risk
+    portfolio = min(1.0, risk_score * (1.0 - cash_ratio * 0.3))
+
+    return concentration, sector, position, volatility, correlation, portfolio, cash_ratio
+
+# Indicator columns read by the technical agent, and their position in the tail array
+SIGNAL_COLUMNS = ('RSI', 'MACD', 'MACD_signal', 'Close', 'SMA_20', 'SMA_50',
+                  'BB_upper', 'BB_lower', 'Stoch_K', 'Stoch_D', 'Volume', 'Volume_SMA')
+(RSI, MACD, MACD_SIGNAL, CLOSE, SMA_20, SMA_50,
+ BB_UPPER, BB_LOWER, STOCH_K, STOCH_D, VOLUME, VOLUME_SMA) = range(len(SIGNAL_COLUMNS))
+
+@njit(cache=True, nogil=True)
+def technical_signals_kernel(prev, latest):
+    """Technical signals from the last two bars laid out as SIGNAL_COLUMNS.
+
+    Returns [rsi, macd, ma, bb, stoch, volume_multiplier]; each signal is
+    1.0 (bullish), -1.0 (bearish) or 0.0.
+    """
+    out = np.zeros(6)
+
+    # RSI: oversold buy / overbought sell
+    rsi = latest[RSI]
+    out[0] = 1.0 if rsi < 30 else (-1.0 if rsi > 70 else 0.0)
+
+    # MACD crossover
+    macd = latest[MACD]
+    macd_signal = latest[MACD_SIGNAL]
+    if macd > macd_signal and prev[MACD] <= prev[MACD_SIGNAL]:
+        out[1] = 1.0
+    elif macd < macd_signal and prev[MACD] >= prev[MACD_SIGNAL]:
+        out[1] = -1.0
+
+    # Moving average trend
+    price = latest[CLOSE]
+    sma_20 = latest[SMA_20]
+    sma_50 = latest[SMA_50]
+    if price > sma_20 and sma_20 > sma_50:
+        out[2] = 1.0
+    elif price < sma_20 and sma_20 < sma_50:
+        out[2] = -1.0
+
+    # Bollinger Bands
+    out[3] = 1.0 if price <= latest[BB_LOWER] else (-1.0 if price >= latest[BB_UPPER] else 0.0)
+
+    # Stochastic oscillator
+    stoch_k = latest[STOCH_K]
+    stoch_d = latest[STOCH_D]
+    if stoch_k < 20 and stoch_d < 20:
+        out[4] = 1.0
+    elif stoch_k > 80 and stoch_d > 80:
+        out[4] = -1.0
+
+    # High volume amplifies the other signals
+    out[5] = 1.2 if latest[VOLUME] > latest[VOLUME_SMA] * 1.5 else 1.0
+
+    return out
+
+EMPTY = np.empty(0, dtype=np.float64)
+
+# Compile (or load from cache) at import so the first signal doesn't pay JIT latency
+volatility_kernel(np.ones(ATR_WINDOW), np.ones(ATR_WINDOW), np.ones(ATR_WINDOW), ATR_WINDOW)
+technical_signals_kernel(np.ones(len(SIGNAL_COLUMNS)), np.ones(len(SIGNAL_COLUMNS)))
+risk_metrics_kernel(np.ones(ATR_WINDOW), np.ones(ATR_WINDOW), np.ones(ATR_WINDOW), np.ones(2),
+                    1.0, 0.5, 1, 0.5, 0.3)
@@ -2,18 +2,52 @@ from .base_agent import BaseAgent, TradingSignal
 import pandas as pd
 from typing import Dict, List, Tuple
 import numpy as np
+from .kernels import risk_metrics_kernel, EMPTY
 # from services.portfolio_service import portfolio_service  # TODO: Implement or provide portfolio_service
 
+# Mock sector assignments (in real implementation, fetch from data service)
+SECTOR_MAP = {
+    'AAPL': 'Technology', 'GOOGL': 'Technology', 'MSFT': 'Technology',
+    'TSLA': 'Automotive', 'AMZN': 'E-commerce', 'NVDA': 'Technology',
+    'META': 'Technology', 'NFLX': 'Entertainment'
+}
+
+# Mock correlation matrix (simplified)
+HIGH_CORRELATION_PAIRS = [
+    ('AAPL', 'MSFT'), ('GOOGL', 'META'), ('NVDA', 'AAPL'),
+    ('TSLA', 'AAPL'), ('AMZN', 'GOOGL')
+]
+
+# Symbol -> symbols it is highly correlated with
+CORRELATION_INDEX: Dict[str, frozenset] = {}
+for _a, _b in HIGH_CORRELATION_PAIRS:
+    CORRELATION_INDEX[_a] = CORRELATION_INDEX.get(_a, frozenset()) | {_b}
+    CORRELATION_INDEX[_b] = CORRELATION_INDEX.get(_b, frozenset()) | {_a}
+
+AI_PROMPT_TEMPLATE = (
+    "Risk analysis for {symbol}:\n"
+    "Current Price: ${price:.2f}\n"
+    "Portfolio Risk Score: {portfolio_risk:.2f}\n"
+    "Position Risk: {position_risk:.2f}\n"
+    "Volatility: {volatility:.2f}\n"
+    "Sector Concentration: {sector_risk:.2f}\n"
+    "Cash Ratio: {cash_ratio:.2f}\n\n"
+    "Recommended Action: {action}\n"
+    "Risk Level: {risk_level}\n\n"
+    "Provide risk management recommendations and position sizing guidance."
+)
+
 class RiskManagementAgent(BaseAgent):
     def __init__(self):
         super().__init__("Risk Management Agent")
         self.max_portfolio_risk = 0.02  # 2% max portfolio risk per trade
         self.max_sector_allocation = 0.3  # 30% max allocation per sector
         self.max_correlation_exposure = 0.5  # 50% max exposure to highly correlated assets
+        self.ai_skip_confidence = 0.75  # Rule-based actions at or above this confidence skip the LLM
 
     async def analyze(self, symbol: str, data: pd.DataFrame, market_data: Dict) -> TradingSignal:
         """Analyze risk factors and generate risk-adjusted trading signal"""
-        current_price = data['Close'].iloc[-1] if not data.empty else market_data.get('price', 0.0)
+        current_price = data['Close'].iloc[-1] if data.shape[0] else market_data.get('price', 0.0)
 
         # Get current portfolio state
         # portfolio_summary = await portfolio_service.get_portfolio_summary() # TODO: Implement or provide portfolio_service
@@ -27,7 +61,7 @@ class RiskManagementAgent(BaseAgent):
         }
 
         # Calculate various risk metrics
-        risk_metrics = await self._calculate_risk_metrics(symbol, data, portfolio_summary)
+        risk_metrics = self._calculate_risk_metrics(symbol, data, portfolio_summary)
 
         # Determine risk-adjusted action
         action, confidence = self._determine_risk_adjusted_action(risk_metrics, symbol, current_price)
@@ -35,21 +69,25 @@ class RiskManagementAgent(BaseAgent):
         # Generate risk-based reasoning
         reasoning = self._generate_risk_reasoning(risk_metrics, symbol)
 
-        # Get AI-enhanced risk analysis
-        ai_prompt = (
-            f"Risk analysis for {symbol}:\n"
-            f"Current Price: ${current_price:.2f}\n"
-            f"Portfolio Risk Score: {risk_metrics['portfolio_risk']:.2f}\n"
-            f"Position Risk: {risk_metrics['position_risk']:.2f}\n"
-            f"Volatility: {risk_metrics['volatility']:.2f}\n"
-            f"Sector Concentration: {risk_metrics['sector_risk']:.2f}\n"
-            f"Cash Ratio: {risk_metrics['cash_ratio']:.2f}\n\n"
-            f"Recommended Action: {action}\n"
-            f"Risk Level: {risk_metrics['overall_risk_level']}\n\n"
-            f"Provide risk management recommendations and position sizing guidance."
-        )
-
-        ai_analysis = await self._get_ai_analysis(ai_prompt)
+        # Get AI-enhanced risk analysis, unless the rules already force the action
+        if risk_metrics['overall_risk_level'] == 'Very High' or confidence >= self.ai_skip_confidence:
+            ai_analysis = "Skipped (deterministic risk action)"
+        else:
+            prompt_values = {
+                'symbol': symbol,
+                'price': round(float(current_price), 2),
+                'portfolio_risk': round(risk_metrics['portfolio_risk'], 2),
+                'position_risk': round(risk_metrics['position_risk'], 2),
+                'volatility': round(risk_metrics['volatility'], 2),
+                'sector_risk': round(risk_metrics['sector_risk'], 2),
+                'cash_ratio': round(risk_metrics['cash_ratio'], 2),
+                'action': action,
+                'risk_level': risk_metrics['overall_risk_level']
+            }
+            ai_prompt = AI_PROMPT_TEMPLATE.format_map(prompt_values)
+
+            # Key the cache on the rounded inputs rather than the rendered text
+            ai_analysis = await self._get_ai_analysis(ai_prompt, cache_key=('risk', *prompt_values.values()))
 
         signal = TradingSignal(
             symbol=symbol,
@@ -64,79 +102,52 @@ class RiskManagementAgent(BaseAgent):
         self.record_signal(signal)
         return signal
 
-    async def _calculate_risk_metrics(self, symbol: str, data: pd.DataFrame, portfolio_summary: Dict) -> Dict:
+    def _calculate_risk_metrics(self, symbol: str, data: pd.DataFrame, portfolio_summary: Dict) -> Dict:
         """Calculate comprehensive risk metrics"""
-        metrics = {}
-
         # Portfolio-level metrics
         total_value = portfolio_summary.get('total_value', 0.0)
         cash_balance = portfolio_summary.get('cash_balance', 0.0)
         positions = portfolio_summary.get('positions', [])
 
-        # Cash ratio
-        metrics['cash_ratio'] = cash_balance / total_value if total_value > 0 else 1.0
-
-        # Portfolio concentration risk
-        metrics['concentration_risk'] = self._calculate_concentration_risk(positions, total_value)
-
-        # Sector risk
-        metrics['sector_risk'] = await self._calculate_sector_risk(positions, symbol)
-
-        # Individual position risk
-        metrics['position_risk'] = self._calculate_position_risk(symbol, data, total_value)
-
-        # Volatility risk
-        metrics['volatility'] = self._calculate_volatility_risk(data)
-
-        # Correlation risk (simplified)
-        metrics['correlation_risk'] = await self._calculate_correlation_risk(symbol, positions)
-
-        # Overall portfolio risk
-        metrics['portfolio_risk'] = self._calculate_overall_portfolio_risk(metrics)
-
-        # Risk level classification
-        metrics['overall_risk_level'] = self._classify_risk_level(metrics['portfolio_risk'])
-
-        return metrics
-
-    def _calculate_concentration_risk(self, positions: List[Dict], total_value: float) -> float:
-        """Calculate portfolio concentration risk"""
-        if not positions or total_value <= 0:
-            return 0.0
-
-        # Calculate Herfindahl-Hirschman Index for concentration
-        concentration_sum = 0.0
-        for position in positions:
-            weight = position['market_value'] / total_value
-            concentration_sum += weight ** 2
-
-        # Normalize to 0-1 scale (1 = fully concentrated, 0 = fully diversified)
-        max_concentration = 1.0  # Single position
-        min_concentration = 1.0 / len(positions) if positions else 1.0
-
-        if max_concentration == min_concentration:
-            normalized_concentration = 1.0
+        # Extract price arrays once for all price-based metrics
+        close = data['Close'].to_numpy(dtype=np.float64) if data.shape[0] and 'Close' in data.columns else EMPTY
+        if close.shape[0] and 'High' in data.columns and 'Low' in data.columns:
+            high = data['High'].to_numpy(dtype=np.float64)
+            low = data['Low'].to_numpy(dtype=np.float64)
         else:
-            normalized_concentration = (concentration_sum - min_concentration) / (max_concentration - min_concentration)
-        return max(0.0, min(1.0, normalized_concentration))
+            high = low = EMPTY
+        position_values = np.fromiter((p['market_value'] for p in positions), dtype=np.float64, count=len(positions))
+
+        # Lookup-based inputs stay in Python; all the arithmetic runs in one compiled kernel
+        (concentration, sector, position, volatility,
+         correlation, portfolio, cash_ratio) = risk_metrics_kernel(
+            close, high, low, position_values, float(total_value), float(cash_balance),
+            self._count_correlated_pairs(symbol, positions),
+            self._calculate_max_sector_allocation(positions),
+            self.max_sector_allocation
+        )
 
-    async def _calculate_sector_risk(self, positions: List[Dict], new_symbol: str) -> float:
-        """Calculate sector concentration risk"""
+        return {
+            'cash_ratio': cash_ratio,
+            'concentration_risk': concentration,
+            'sector_risk': sector,
+            'position_risk': position,
+            'volatility': volatility,
+            'correlation_risk': correlation,
+            'portfolio_risk': portfolio,
+            'overall_risk_level': self._classify_risk_level(portfolio)
+        }
+
+    def _calculate_max_sector_allocation(self, positions: List[Dict]) -> float:
+        """Calculate the largest share of the positions held in a single sector"""
         # This is simplified - in reality, you'd fetch sector data for all positions
-        # For now, we'll assume a mock sector distribution
+        # For now, we'll assume a mock sector distribution (SECTOR_MAP)
 
         sector_allocation = {}
         total_value = sum(pos['market_value'] for pos in positions)
 
-        # Mock sector assignments (in real implementation, fetch from data service)
-        mock_sectors = {
-            'AAPL': 'Technology', 'GOOGL': 'Technology', 'MSFT': 'Technology',
-            'TSLA': 'Automotive', 'AMZN': 'E-commerce', 'NVDA': 'Technology',
-            'META': 'Technology', 'NFLX': 'Entertainment'
-        }
-
         for position in positions:
-            sector = mock_sectors.get(position['symbol'], 'Other')
+            sector = SECTOR_MAP.get(position['symbol'], 'Other')
             if sector not in sector_allocation:
                 sector_allocation[sector] = 0.0
             sector_allocation[sector] += position['market_value']
@@ -146,98 +157,19 @@ class RiskManagementAgent(BaseAgent):
             for sector in sector_allocation:
                 sector_allocation[sector] /= total_value
 
-        # Find maximum sector allocation
-        max_sector_allocation = max(sector_allocation.values()) if sector_allocation else 0.0
-
-        # Risk increases with sector concentration
-        return min(1.0, max_sector_allocation / self.max_sector_allocation)
-
-    def _calculate_position_risk(self, symbol: str, data: pd.DataFrame, portfolio_value: float) -> float:
-        """Calculate individual position risk"""
-        if data.empty or 'Close' not in data.columns:
-            return 1.0  # High risk if no data
-
-        # Price volatility
-        returns = data['Close'].pct_change().dropna()
-        if len(returns) < 2:
-            return 1.0
-
-        volatility = returns.std() * np.sqrt(252)  # Annualized volatility
-
-        # Risk based on volatility (normalize to 0-1)
-        volatility_risk = min(1.0, volatility / 0.5)  # 50% volatility = max risk
-
-        return volatility_risk
-
-    def _calculate_volatility_risk(self, data: pd.DataFrame) -> float:
-        """Calculate volatility-based risk"""
-        if data.empty or len(data) < 20 or 'Close' not in data.columns:
-            return 0.5  # Medium risk if insufficient data
+        return max(sector_allocation.values()) if sector_allocation else 0.0
 
-        # Calculate multiple volatility measures
-        returns = data['Close'].pct_change().dropna()
-
-        # Standard deviation
-        std_vol = returns.std() * np.sqrt(252)
-
-        # Average True Range (ATR) based volatility
-        if all(col in data.columns for col in ['High', 'Low', 'Close']):
-            high_low = data['High'] - data['Low']
-            high_close = np.abs(data['High'] - data['Close'].shift())
-            low_close = np.abs(data['Low'] - data['Close'].shift())
-
-            true_range = pd.DataFrame({'hl': high_low, 'hc': high_close, 'lc': low_close}).max(axis=1)
-            atr_vol = true_range.rolling(14).mean().iloc[-1] / data['Close'].iloc[-1]
-        else:
-            atr_vol = std_vol
-
-        # Combine volatility measures
-        combined_vol = (std_vol + atr_vol) / 2
-
-        # Normalize to 0-1 scale
-        return min(1.0, combined_vol / 0.6)  # 60% annualized vol = max risk
-
-    async def _calculate_correlation_risk(self, symbol: str, positions: List[Dict]) -> float:
-        """Calculate correlation risk (simplified)"""
-        # This is a simplified correlation risk calculation
+    def _count_correlated_pairs(self, symbol: str, positions: List[Dict]) -> int:
+        """Count highly correlated pairs involving the symbol that the portfolio is exposed to (simplified)"""
         # In reality, you'd calculate actual correlations between assets
-
         if not positions:
-            return 0.0
-
-        # Mock correlation matrix (simplified)
-        high_correlation_pairs = [
-            ['AAPL', 'MSFT'], ['GOOGL', 'META'], ['NVDA', 'AAPL'],
-            ['TSLA', 'AAPL'], ['AMZN', 'GOOGL']
-        ]
-
-        correlation_risk = 0.0
-        position_symbols = [pos['symbol'] for pos in positions]
-
-        for pair in high_correlation_pairs:
-            if symbol in pair and any(p_symbol in pair for p_symbol in position_symbols):
-                correlation_risk += 0.2
-
-        return min(1.0, correlation_risk)
-
-    def _calculate_overall_portfolio_risk(self, metrics: Dict) -> float:
-        """Calculate overall portfolio risk score"""
-        weights = {
-            'concentration_risk': 0.25,
-            'sector_risk': 0.20,
-            'position_risk': 0.20,
-            'volatility': 0.20,
-            'correlation_risk': 0.15
-        }
-
-        risk_score = 0.0
-        for metric, weight in weights.items():
-            risk_score += metrics.get(metric, 0.0) * weight
+            return 0
 
-        # Adjust for cash ratio (more cash = lower risk)
-        cash_adjustment = 1.0 - (metrics.get('cash_ratio', 0.0) * 0.3)
+        position_symbols = {pos['symbol'] for pos in positions}
+        partners = CORRELATION_INDEX.get(symbol, frozenset())
 
-        return min(1.0, risk_score * cash_adjustment)
+        # Each highly correlated pair counts once if either side is already held
+        return len(partners) if symbol in position_symbols else len(partners & position_symbols)
 
     def _classify_risk_level(self, risk_score: float) -> str:
         """Classify overall risk level"""
@@ -1,19 +1,36 @@
 from .base_agent import BaseAgent, TradingSignal
 import pandas as pd
-from typing import Dict, List
+from typing import Dict, List, Optional
 import re
+import time
+import numpy as np
+from config import config
+
+AI_PROMPT_TEMPLATE = (
+    "Analyze market sentiment for {symbol}:\n"
+    "Current Price: ${price:.2f}\n"
+    "News Sentiment Score: {news_score:.2f}\n"
+    "Market Sentiment Score: {market_score:.2f}\n"
+    "Combined Sentiment: {combined_score:.2f}\n\n"
+    "Recent market conditions and any notable events affecting {symbol}.\n"
+    "Provide sentiment-based trading recommendation and key factors to consider."
+)
 
 class SentimentAgent(BaseAgent):
-    def __init__(self):
+    def __init__(self, rng: Optional[np.random.Generator] = None):
         super().__init__("Sentiment Analysis Agent")
+        # Generator for the mock news sentiment; inject one (or set MOCK_SENTIMENT_SEED) to pin it
+        self._rng = rng if rng is not None else np.random.default_rng(config.MOCK_SENTIMENT_SEED)
         self.sentiment_keywords = {
             'positive': ['bullish', 'positive', 'growth', 'profit', 'revenue', 'strong', 'beat', 'exceed', 'upgrade'],
             'negative': ['bearish', 'negative', 'loss', 'decline', 'weak', 'miss', 'downgrade', 'concern', 'risk']
         }
+        self.news_cache_ttl = 300  # Reuse news sentiment within the same 5-minute bucket
+        self._news_cache: Dict[tuple, Dict] = {}
     
     async def analyze(self, symbol: str, data: pd.DataFrame, market_data: Dict) -> TradingSignal:
         """Analyze market sentiment and generate trading signal"""
-        current_price = data['Close'].iloc[-1] if not data.empty else market_data.get('price', 0)
+        current_price = data['Close'].iloc[-1] if data.shape[0] else market_data.get('price', 0)
         
         # Get news sentiment (placeholder - would integrate with news APIs)
         news_sentiment = await self._analyze_news_sentiment(symbol)
@@ -30,19 +47,21 @@ class SentimentAgent(BaseAgent):
         # Generate reasoning
         reasoning = self._generate_sentiment_reasoning(news_sentiment, market_sentiment, combined_sentiment)
         
-        # Get AI-enhanced analysis
-        ai_prompt = f"""
-        Analyze market sentiment for {symbol}:
-        Current Price: ${current_price:.2f}
-        News Sentiment Score: {news_sentiment['score']:.2f}
-        Market Sentiment Score: {market_sentiment['score']:.2f}
-        Combined Sentiment: {combined_sentiment:.2f}
-        
-        Recent market conditions and any notable events affecting {symbol}.
-        Provide sentiment-based trading recommendation and key factors to consider.
-        """
-        
-        ai_analysis = await self._get_ai_analysis(ai_prompt)
+        # Get AI-enhanced analysis, unless the signal is a neutral hold not worth narrating
+        if action == "hold":
+            ai_analysis = "Skipped (neutral hold)"
+        else:
+            prompt_values = {
+                'symbol': symbol,
+                'price': round(float(current_price), 2),
+                'news_score': round(float(news_sentiment['score']), 2),
+                'market_score': round(float(market_sentiment['score']), 2),
+                'combined_score': round(float(combined_sentiment), 2)
+            }
+            ai_prompt = AI_PROMPT_TEMPLATE.format_map(prompt_values)
+            
+            # Key the cache on the rounded inputs rather than the rendered text
+            ai_analysis = await self._get_ai_analysis(ai_prompt, cache_key=('sentiment', *prompt_values.values()))
         
         signal = TradingSignal(
             symbol=symbol,
@@ -51,13 +70,28 @@ class SentimentAgent(BaseAgent):
             reasoning=f"{reasoning}\n\nAI Analysis: {ai_analysis}",
             target_price=self._calculate_take_profit(current_price, action),
             stop_loss=self._calculate_stop_loss(current_price, action),
-            position_size=self._calculate_position_size(confidence, 100000)
+            position_size=self._default_position_size(confidence)
         )
         
         self.record_signal(signal)
         return signal
     
     async def _analyze_news_sentiment(self, symbol: str) -> Dict:
+        """Analyze news sentiment for the stock, cached per symbol and time bucket"""
+        bucket = int(time.time() // self.news_cache_ttl)
+        key = (symbol, bucket)
+        cached = self._news_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        news_sentiment = await self._fetch_news_sentiment(symbol)
+        
+        # Drop entries from earlier buckets so the cache stays bounded by the symbol count
+        self._news_cache = {k: v for k, v in self._news_cache.items() if k[1] == bucket}
+        self._news_cache[key] = news_sentiment
+        return news_sentiment
+    
+    async def _fetch_news_sentiment(self, symbol: str) -> Dict:
         """Analyze news sentiment for the stock"""
         # Placeholder implementation
         # In a real implementation, this would:
@@ -66,10 +100,9 @@ class SentimentAgent(BaseAgent):
         # 3. Weight by source credibility and recency
         
         # Mock sentiment analysis
-        import random
-        
-        sentiment_score = random.uniform(-1.0, 1.0)  # Mock sentiment
-        news_count = random.randint(0, 20)
+        score_draw, count_draw = self._rng.random(2).tolist()
+        sentiment_score = score_draw * 2.0 - 1.0  # Mock sentiment in [-1, 1)
+        news_count = int(count_draw * 21)  # 0-20 articles
         
         return {
             'score': sentiment_score,
@@ -83,7 +116,8 @@ class SentimentAgent(BaseAgent):
     
     def _analyze_market_sentiment(self, data: pd.DataFrame, market_data: Dict) -> Dict:
         """Analyze market-based sentiment indicators"""
-        if data.empty:
+        n = data.shape[0]
+        if n == 0:
             return {'score': 0.0, 'confidence': 0.0, 'indicators': {}}
         
         indicators = {}
@@ -101,10 +135,15 @@ class SentimentAgent(BaseAgent):
             else:
                 indicators['volume'] = 0.0
         
+        # Returns over the last 20 bars are all the momentum/volatility indicators need
+        closes = data['Close'].iloc[-21:].to_numpy(dtype=np.float64)
+        # Same arithmetic as pct_change, with the subtraction done in place
+        returns = closes[1:] / closes[:-1]
+        returns -= 1.0
+        
         # Price momentum
-        if len(data) >= 5:
-            recent_returns = data['Close'].pct_change().tail(5)
-            momentum = recent_returns.mean()
+        if n >= 5:
+            momentum = returns[-5:].mean()
             
             if momentum > 0.02:  # 2% average daily gain
                 indicators['momentum'] = 0.4
@@ -114,8 +153,9 @@ class SentimentAgent(BaseAgent):
                 indicators['momentum'] = momentum * 10  # Scale to -0.2 to 0.2
         
         # Volatility sentiment
-        if len(data) >= 20:
-            volatility = data['Close'].pct_change().rolling(20).std().iloc[-1]
+        if n >= 20:
+            # A full 20-return window needs 21 bars; with fewer the reading is NaN (neutral)
+            volatility = returns[-20:].std(ddof=1) if returns.shape[0] >= 20 else np.nan
             
             if volatility > 0.03:  # High volatility
                 indicators['volatility'] = -0.2  # Generally negative
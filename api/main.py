@@ -1,16 +1,45 @@
-from fastapi import FastAPI, HTTPException, Query
-from pydantic import BaseModel
-from typing import Dict
+from fastapi import FastAPI, HTTPException, Query, Depends, Request
+from pydantic import BaseModel, ConfigDict, Field, StringConstraints
+from typing import Annotated, Dict, List, Literal, Optional, Tuple
 import asyncio
 from trading_engine import stock_analyzer
-import requests
+from services.data_service import data_service, map_symbol_for_yfinance
+from services.cache_service import redis_cache
+from config import config
+import httpx
+import orjson
+from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
-import os
+from fastapi.responses import ORJSONResponse
+import re
+import time
+import logging
+from collections import OrderedDict
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled client for the app's lifetime so Twelve Data lookups reuse connections
+    app.state.http = httpx.AsyncClient(
+        timeout=10.0,
+        transport=httpx.AsyncHTTPTransport(
+            http2=True,  # concurrent lookups multiplex over one TLS connection
+            retries=2,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+        )
+    )
+    yield
+    await app.state.http.aclose()
+    await redis_cache.close()
+
+def get_http_client(request: Request) -> httpx.AsyncClient:
+    return request.app.state.http
 
 app = FastAPI(
     title="AI Stock Analyzer",
     description="Analyze a stock symbol using AI-powered agents (technical and sentiment)",
-    version="2.0.0"
+    version="2.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -22,10 +51,45 @@ app = FastAPI(
 #     allow_headers=["*"],
 # )
 
+# Normalized during validation, so handlers get a stripped, upper-case symbol
+Symbol = Annotated[str, StringConstraints(strip_whitespace=True, to_upper=True, min_length=1)]
+
 class AnalysisRequest(BaseModel):
-    symbol: str
+    model_config = ConfigDict(frozen=True)
+
+    symbol: Symbol
+
+class BatchAnalysisRequest(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    symbols: Annotated[List[Symbol], Field(min_length=1, max_length=20)]
+
+# Debug output is filtered out by default; set LOG_LEVEL=DEBUG to trace requests
+logger = logging.getLogger("api")
+logger.setLevel(config.LOG_LEVEL.upper())
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    logger.addHandler(_handler)
+    logger.propagate = False
+
+TWELVE_DATA_API_KEY = config.TWELVE_DATA_API_KEY
+TWELVE_DATA_SEARCH_URL = "https://api.twelvedata.com/symbol_search"
+
+# Support US and Indian stocks
+ALLOWED_EXCHANGES = frozenset({'NYSE', 'NASDAQ', 'NSE', 'BSE'})
 
-TWELVE_DATA_API_KEY = os.getenv("TWELVE_DATA_API_KEY", "")
+TICKER_RE = re.compile(r"\A[A-Z]{2,5}\Z")
+SUFFIXED_TICKER_RE = re.compile(r"\A([A-Z0-9&-]{1,20})\.(NSE|BSE|NS|BO|NYSE|NASDAQ)\Z")
+EXCHANGE_SUFFIXES = {
+    'NSE': 'NSE', 'NS': 'NSE',
+    'BSE': 'BSE', 'BO': 'BSE',
+    'NYSE': 'NYSE', 'NASDAQ': 'NASDAQ'
+}
+
+# Recently resolved company names, in-process LRU in front of Redis
+RESOLVED_NAMES_MAX_ENTRIES = 4096
+_resolved_names: "OrderedDict[str, Tuple[str, str]]" = OrderedDict()
 
 @app.get("/")
 def root():
@@ -35,57 +99,205 @@ def root():
         "status": "running"
     }
 
-@app.post("/analyze")
-async def analyze_symbol(request: AnalysisRequest):
-    symbol = request.symbol.upper()
-    print("analyze symbol", symbol)
-    exchange = None
-    # Try to resolve symbol if not a known ticker (e.g., if user entered "APPLE")
-    if not (2 <= len(symbol) <= 5 and symbol.isalpha()):  # crude check, can be improved
-        url = f"https://api.twelvedata.com/symbol_search?symbol={symbol.upper()}&apikey={TWELVE_DATA_API_KEY}"
-        print("analyze url", url)
+class TokenBucket:
+    """Async token bucket allowing `rate` acquisitions per second with bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.rate:
+            return
+        # Waiters queue on the lock, so tokens are handed out in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+twelve_data_limiter = TokenBucket(config.TWELVE_DATA_RATE_PER_SEC)
+
+async def twelve_data_search(client: httpx.AsyncClient, query: str) -> Dict:
+    """Query Twelve Data symbol_search under the rate limit, retrying 429/5xx and timeouts with backoff"""
+    # At least one attempt, so TWELVE_DATA_MAX_RETRIES=0 can't fall through and return None
+    attempts = max(1, config.TWELVE_DATA_MAX_RETRIES)
+    for attempt in range(attempts):
+        await twelve_data_limiter.acquire()
         try:
-            r = requests.get(url, timeout=5)
-            # r.raise_for_status()
-            data = r.json()
-            print("analyze data", data)
-            for item in data.get('data', []):
-                if item.get('exchange') in ['NYSE', 'NASDAQ', 'NSE', 'BSE']:
-                    symbol = item['symbol']
-                    exchange = item['exchange']
-                    break
-        except Exception as e:
-            print("twelvedata error", e, end="\n\n")
-            raise HTTPException(status_code=500, detail=str(e))
+            r = await client.get(TWELVE_DATA_SEARCH_URL, params={"symbol": query, "apikey": TWELVE_DATA_API_KEY}, timeout=5)
+            status = r.status_code
+            if status != 429 and status < 500:
+                raw = r.content
+                logger.debug("twelvedata response %.200r", raw)
+                data = orjson.loads(raw)
+                # Quota errors may also come back as HTTP 200 with the code in the body
+                if not (isinstance(data, dict) and data.get('code') == 429):
+                    return data
+                status = 429
+            error = httpx.HTTPStatusError(f"Twelve Data returned {status}", request=r.request, response=r)
+        except httpx.TimeoutException as e:
+            error = e
+        if attempt == attempts - 1:
+            raise error
+        logger.warning("twelvedata retry %s after %s", attempt + 1, error)
+        await asyncio.sleep(min(8, 0.5 * 2 ** attempt))
+
+async def resolve_symbol(symbol: str, client: httpx.AsyncClient) -> Tuple[str, Optional[str]]:
+    """Resolve a company name to a (symbol, exchange) pair; ticker-like input passes through"""
+    # Plain tickers (crude check, e.g. AAPL) go straight to the analyzer
+    if TICKER_RE.match(symbol):
+        return symbol, None
+    # Exchange-suffixed tickers (e.g. RELIANCE.NSE, TCS.NS, AAPL.NASDAQ) need no lookup either
+    suffixed = SUFFIXED_TICKER_RE.match(symbol)
+    if suffixed:
+        return suffixed.group(1), EXCHANGE_SUFFIXES[suffixed.group(2)]
     
+    # Try to resolve the company name (e.g., if user entered "APPLE INC")
+    resolved = _resolved_names.get(symbol)
+    if resolved is not None:
+        _resolved_names.move_to_end(symbol)
+        return resolved
+    cache_key = f"td:resolve:{symbol.lower()}"
+    cached = await redis_cache.get(cache_key)
+    if cached is not None:
+        _remember_resolved(symbol, tuple(cached))
+        return tuple(cached)
+    
+    logger.debug("analyze search %s", symbol)
+    data = await twelve_data_search(client, symbol)
+    for item in data.get('data', []):
+        if item.get('exchange') in ALLOWED_EXCHANGES:
+            resolved = (item['symbol'], item['exchange'])
+            _remember_resolved(symbol, resolved)
+            await redis_cache.set(cache_key, list(resolved), config.SYMBOL_SEARCH_CACHE_TTL)
+            return resolved
+    return symbol, None
+
+def _remember_resolved(name: str, resolved: Tuple[str, str]):
+    _resolved_names[name] = resolved
+    _resolved_names.move_to_end(name)
+    while len(_resolved_names) > RESOLVED_NAMES_MAX_ENTRIES:
+        _resolved_names.popitem(last=False)
+
+async def analyze_resolved(symbol: str, exchange: Optional[str]) -> Dict:
+    """Run the analyzer, going through the shared Redis cache first"""
+    # Shared across workers, unlike the analyzer's in-process cache
+    cache_key = f"analyze:{symbol}:{exchange or ''}"
+    cached = await redis_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    result = await stock_analyzer.analyze(symbol, exchange)
+    if 'error' not in result:
+        await redis_cache.set(cache_key, result, config.ANALYSIS_CACHE_TTL)
+    return result
+
+@app.post("/analyze")
+async def analyze_symbol(request: AnalysisRequest, client: httpx.AsyncClient = Depends(get_http_client)):
+    symbol = request.symbol
+    logger.debug("analyze symbol %s", symbol)
     try:
-        result = await stock_analyzer.analyze(symbol, exchange)
-        return result
+        symbol, exchange = await resolve_symbol(symbol, client)
     except Exception as e:
-        print("analyze error", e, end="\n\n")
+        logger.error("twelvedata error %s", e)
         raise HTTPException(status_code=500, detail=str(e))
+    
+    try:
+        return await analyze_resolved(symbol, exchange)
+    except Exception as e:
+        logger.error("analyze error %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def _resolve_and_analyze(symbol: str, client: httpx.AsyncClient, semaphore: asyncio.Semaphore) -> Dict:
+    async with semaphore:
+        # Timed inside the semaphore so queueing behind other symbols doesn't count against it
+        try:
+            return await asyncio.wait_for(_resolve_then_analyze(symbol, client), config.ANALYZE_BATCH_SYMBOL_TIMEOUT)
+        except asyncio.TimeoutError:
+            return {"error": f"Analysis timed out for {symbol}"}
+
+async def _resolve_then_analyze(symbol: str, client: httpx.AsyncClient) -> Dict:
+    symbol, exchange = await resolve_symbol(symbol, client)
+    return await analyze_resolved(symbol, exchange)
+
+@app.post("/analyze_batch")
+async def analyze_batch(request: BatchAnalysisRequest, client: httpx.AsyncClient = Depends(get_http_client)):
+    # Each symbol's resolve + analyze chain runs concurrently with the others, a bounded number at a time
+    symbols = list(dict.fromkeys(request.symbols))
+    semaphore = asyncio.Semaphore(config.ANALYZE_BATCH_CONCURRENCY)
+    results = await asyncio.gather(*(_resolve_and_analyze(s, client, semaphore) for s in symbols), return_exceptions=True)
+    response = {}
+    for symbol, result in zip(symbols, results):
+        if isinstance(result, Exception):
+            logger.error("analyze error %s %s", symbol, result)
+            result = {"error": str(result)}
+        response[symbol] = result
+    return response
+
+HistoryPeriod = Literal["5d", "1mo", "3mo", "6mo", "1y", "2y", "5y", "ytd", "max"]
+
+@app.get("/history")
+async def price_history(symbol: Annotated[Symbol, Query(max_length=40)], period: HistoryPeriod = "1mo",
+                        client: httpx.AsyncClient = Depends(get_http_client)):
+    """Daily OHLCV bars as column arrays, so the frontend needs no Yahoo client of its own"""
+    try:
+        symbol, exchange = await resolve_symbol(symbol, client)
+    except Exception as e:
+        logger.error("twelvedata error %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+    yf_symbol = map_symbol_for_yfinance(symbol, exchange)
+    cache_key = f"history:{yf_symbol}:{period}"
+    cached = await redis_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    data = await data_service.get_price_history(yf_symbol, period=period)
+    if data.empty:
+        raise HTTPException(status_code=404, detail=f"No price history for {yf_symbol}")
+    result = {
+        "symbol": yf_symbol,
+        "tz": str(data.index.tz) if data.index.tz is not None else None,
+        # Epoch milliseconds (UTC); the frontend converts back to the exchange's zone
+        "t": data.index.as_unit("ms").asi8.tolist(),
+        "open": data['Open'].tolist(),
+        "high": data['High'].tolist(),
+        "low": data['Low'].tolist(),
+        "close": data['Close'].tolist(),
+        "volume": data['Volume'].tolist(),
+    }
+    await redis_cache.set(cache_key, result, config.HISTORY_CACHE_TTL)
+    return result
 
 @app.get("/search")
-def search_companies(q: str = Query(..., min_length=1)):
-    url = f"https://api.twelvedata.com/symbol_search?symbol={q}&apikey={TWELVE_DATA_API_KEY}"
-    print("search url", url)
+async def search_companies(q: str = Query(..., min_length=1), client: httpx.AsyncClient = Depends(get_http_client)):
+    logger.debug("search query %s", q)
+    cache_key = f"td:search:{q.strip().lower()}"
+    cached = await redis_cache.get(cache_key)
+    if cached is not None:
+        return cached
     try:
-        r = requests.get(url, timeout=5)
-        print("search response", r.json())
-        # r.raise_for_status()
-        data = r.json()
-        results = []
-        for item in data.get('data', []):
-            # Support US and Indian stocks (NYSE, NASDAQ, NSE, BSE)
-            if item.get('exchange') in ['NYSE', 'NASDAQ', 'NSE', 'BSE']:
-                results.append({
-                    "symbol": item['symbol'],
-                    "shortname": item.get('instrument_name', item.get('name', '')),
-                    "exchange": item['exchange'],
-                    "type": item.get('instrument_type', '')
-                })
-        print("search results", results)
+        data = await twelve_data_search(client, q)
+        results = [
+            {
+                "symbol": item['symbol'],
+                "shortname": item.get('instrument_name', item.get('name', '')),
+                "exchange": item['exchange'],
+                "type": item.get('instrument_type', '')
+            }
+            for item in data.get('data', ())
+            if item.get('exchange') in ALLOWED_EXCHANGES
+        ]
+        logger.debug("search results %s", results)
+        # Only cache real answers, not Twelve Data error payloads
+        if 'data' in data:
+            await redis_cache.set(cache_key, results, config.SYMBOL_SEARCH_CACHE_TTL)
         return results
     except Exception as e:
-        print("twelvedata error", e)
+        logger.error("twelvedata error %s", e)
         return []
\ No newline at end of file
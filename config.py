@@ -1,24 +1,64 @@
 import os
-from dotenv import load_dotenv
+from functools import lru_cache
+from typing import Optional
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
-load_dotenv()
-
-class Config:
+class Config(BaseSettings):
+    """Settings parsed and type-checked once from the environment and .env"""
+    model_config = SettingsConfigDict(
+        env_file=os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env"),
+        extra="ignore"
+    )
+    
     # API Keys
-    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
-    GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
-    TWELVE_DATA_API_KEY = os.getenv("TWELVE_DATA_API_KEY", "")
-    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+    GEMINI_API_KEY: str = ""
+    GROQ_API_KEY: str = ""
+    TWELVE_DATA_API_KEY: str = ""
+    OPENAI_API_KEY: str = ""
     
     # AI Agent Settings
-    AI_UPDATE_INTERVAL = 300  # 5 minutes
-    SENTIMENT_ANALYSIS_ENABLED = True
-    TECHNICAL_ANALYSIS_ENABLED = True
-    FUNDAMENTAL_ANALYSIS_ENABLED = True
+    AI_UPDATE_INTERVAL: int = 300  # 5 minutes
+    SENTIMENT_ANALYSIS_ENABLED: bool = True
+    TECHNICAL_ANALYSIS_ENABLED: bool = True
+    FUNDAMENTAL_ANALYSIS_ENABLED: bool = True
+    MOCK_SENTIMENT_SEED: Optional[int] = None  # None draws fresh OS entropy each start
+    
+    # LLM Request Bounds
+    LLM_TIMEOUT: float = 20.0  # seconds
+    LLM_MAX_RETRIES: int = 3
+    LLM_MAX_TOKENS: int = 256
+    LLM_MAX_CONCURRENCY: int = 8  # in-flight requests across all providers
+    LLM_BREAKER_THRESHOLD: int = 5  # failures before opening
+    LLM_BREAKER_WINDOW: float = 60.0  # seconds
+    LLM_BREAKER_COOLDOWN: float = 30.0  # seconds
+    
+    # LLM Response Cache
+    LLM_CACHE_TTL: int = 300  # 5 minutes
+    LLM_CACHE_MAX_ENTRIES: int = 512
+    LLM_CACHE_DIR: str = ""  # e.g. "cache/llm" to enable the disk tier
+    
+    # Twelve Data Request Bounds
+    TWELVE_DATA_RATE_PER_SEC: float = 8.0  # 0 = no client-side limit
+    TWELVE_DATA_MAX_RETRIES: int = 4
+    ANALYZE_BATCH_CONCURRENCY: int = 8  # symbols analyzed at once per /analyze_batch request
+    ANALYZE_BATCH_SYMBOL_TIMEOUT: float = 60.0  # seconds one symbol may take before the batch gives up on it
+    
+    # Shared Redis Cache
+    REDIS_URL: str = ""  # e.g. "redis://localhost:6379/0"; empty disables Redis
+    SYMBOL_SEARCH_CACHE_TTL: int = 86400  # 24 hours
+    ANALYSIS_CACHE_TTL: int = 120  # prices go stale quickly
+    HISTORY_CACHE_TTL: int = 900  # daily bars only change once a session
+    
+    # Logging
+    LOG_LEVEL: str = "WARNING"
     
     # Trading Parameters
-    STOP_LOSS_PERCENTAGE = float(os.getenv("STOP_LOSS_PERCENTAGE", 0.05))  # 5%
-    TAKE_PROFIT_PERCENTAGE = float(os.getenv("TAKE_PROFIT_PERCENTAGE", 0.15))  # 15%
-    MAX_POSITION_SIZE = float(os.getenv("MAX_POSITION_SIZE", 0.1))  # 10%
+    STOP_LOSS_PERCENTAGE: float = 0.05  # 5%
+    TAKE_PROFIT_PERCENTAGE: float = 0.15  # 15%
+    MAX_POSITION_SIZE: float = 0.1  # 10%
+
+@lru_cache
+def get_config() -> Config:
+    return Config()
 
-config = Config() 
\ No newline at end of file
+config = get_config()
@@ -1,63 +1,143 @@
 import requests
 from config import config
+from openai import AsyncOpenAI
 import httpx
 import asyncio
+import functools
+import time
 
+# Built once so every call reuses the same connection pool and request bounds
+_http_client = httpx.AsyncClient(
+    timeout=config.LLM_TIMEOUT,
+    limits=httpx.Limits(max_connections=64, max_keepalive_connections=32)
+)
+_openai_client = AsyncOpenAI(
+    api_key=config.OPENAI_API_KEY,
+    timeout=config.LLM_TIMEOUT,
+    max_retries=0,  # rate_limited owns retries; SDK retries would multiply them
+    http_client=_http_client,
+) if config.OPENAI_API_KEY else None
+_gemini_model = None
+
+class CircuitBreaker:
+    """Short-circuits LLM calls after repeated failures within a time window"""
+
+    def __init__(self, failure_threshold: int, window: float, cooldown: float):
+        self.failure_threshold = failure_threshold
+        self.window = window
+        self.cooldown = cooldown
+        self.failures = []
+        self.opened_at = None
+
+    def is_open(self) -> bool:
+        if self.opened_at is None:
+            return False
+        if time.time() - self.opened_at >= self.cooldown:
+            # Cooldown elapsed - let the next call through to probe the providers
+            self.opened_at = None
+            self.failures = []
+            return False
+        return True
+
+    def record_success(self):
+        self.failures = []
+
+    def record_failure(self):
+        now = time.time()
+        self.failures = [t for t in self.failures if now - t <= self.window]
+        self.failures.append(now)
+        if len(self.failures) >= self.failure_threshold:
+            self.opened_at = now
+
+llm_breaker = CircuitBreaker(
+    failure_threshold=config.LLM_BREAKER_THRESHOLD,
+    window=config.LLM_BREAKER_WINDOW,
+    cooldown=config.LLM_BREAKER_COOLDOWN
+)
+
+# Caps in-flight provider requests so a watchlist fan-out stays inside provider rate limits
+_llm_semaphore = asyncio.Semaphore(config.LLM_MAX_CONCURRENCY)
+
+def _is_transient(error) -> bool:
+    """Rate limits, server errors and timeouts are worth retrying; anything else is not"""
+    if isinstance(error, (asyncio.TimeoutError, httpx.TimeoutException)):
+        return True
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if status is None and getattr(error, "response", None) is not None:
+        status = getattr(error.response, "status_code", None)
+    return isinstance(status, int) and (status == 429 or status >= 500)
+
+def rate_limited(func):
+    """Run an LLM call under the shared concurrency cap, retrying 429/5xx with exponential backoff"""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        # At least one attempt, so LLM_MAX_RETRIES=0 can't skip the call and return None
+        attempts = max(1, config.LLM_MAX_RETRIES)
+        for attempt in range(attempts):
+            async with _llm_semaphore:
+                try:
+                    return await func(*args, **kwargs)
+                except Exception as e:
+                    if attempt == attempts - 1 or not _is_transient(e):
+                        raise
+            # Back off outside the semaphore so waiting doesn't hold a slot
+            await asyncio.sleep(min(30, 2 ** attempt))
+    return wrapper
+
+def _get_gemini_model():
+    global _gemini_model
+    if _gemini_model is None:
+        import google.generativeai as genai
+        genai.configure(api_key=config.GEMINI_API_KEY)
+        _gemini_model = genai.GenerativeModel('gemini-2.0-flash')
+    return _gemini_model
+
+@rate_limited
 async def ask_gemini(prompt):
-    import google.generativeai as genai
-    genai.configure(api_key=config.GEMINI_API_KEY)
-    model = genai.GenerativeModel('gemini-2.0-flash')
+    model = _get_gemini_model()
     # Use run_in_executor to avoid blocking event loop
     loop = asyncio.get_event_loop()
-    response = await loop.run_in_executor(None, lambda: model.generate_content(prompt))
+    response = await loop.run_in_executor(
+        None,
+        lambda: model.generate_content(
+            prompt,
+            generation_config={"max_output_tokens": config.LLM_MAX_TOKENS},
+            request_options={"timeout": config.LLM_TIMEOUT},
+        )
+    )
     print("ask_gemini response", response.text.strip())
     return response.text.strip()
 
+@rate_limited
 async def ask_groq(prompt):
     headers = {"Authorization": f"Bearer {config.GROQ_API_KEY}"}
-    async with httpx.AsyncClient(timeout=8) as client:
-        # Replace with actual Groq endpoint and payload
-        response = await client.post(
-            "https://api.groq.com/v1/validate",  # Placeholder endpoint
-            json={"prompt": prompt},
-            headers=headers
-        )
-        print("ask_groq response", response.json())
-        return response.json().get("result", "")
+    # Replace with actual Groq endpoint and payload
+    response = await _http_client.post(
+        "https://api.groq.com/v1/validate",  # Placeholder endpoint
+        json={"prompt": prompt, "max_tokens": config.LLM_MAX_TOKENS},
+        headers=headers,
+        timeout=8
+    )
+    response.raise_for_status()
+    print("ask_groq response", response.json())
+    return response.json().get("result", "")
 
+@rate_limited
 async def ask_chatgpt(prompt):
-    import openai
-    openai.api_key = config.OPENAI_API_KEY
-    try:
-        # Use run_in_executor to avoid blocking event loop
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(
-            None,
-            lambda: openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=512,
-                temperature=0.7,
-            )
-        )
-        answer = response.choices[0].message["content"].strip()
-        print("ask_chatgpt response", answer)
-        return answer
-    except Exception as e:
-        print("ask_chatgpt error", str(e))
-        return f"ChatGPT error: {str(e)}"
-
-async def multi_llm_analysis(prompt):
-    tasks = {"gemini": ask_gemini(prompt)}
-    if config.GROQ_API_KEY:
-        tasks["groq"] = ask_groq(prompt)
-    if config.OPENAI_API_KEY:
-        tasks["chatgpt"] = ask_chatgpt(prompt)
-    results = await asyncio.gather(*tasks.values(), return_exceptions=True)
-    return {k: (v if not isinstance(v, Exception) else f"error: {v}") for k, v in zip(tasks.keys(), results)}
+    # Errors propagate so rate_limited can retry 429/5xx and callers can tell failure from an answer
+    response = await _openai_client.chat.completions.create(
+        model="gpt-3.5-turbo",
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=config.LLM_MAX_TOKENS,
+        temperature=0.7,
+        timeout=config.LLM_TIMEOUT,
+    )
+    answer = response.choices[0].message.content.strip()
+    print("ask_chatgpt response", answer)
+    return answer
 
-def validate_with_gemini(llm_results, original_prompt):
-    validation_prompt = (
+def build_validation_prompt(llm_results, original_prompt):
+    return (
         f"Given the following stock analysis responses from different AI models for the prompt:\n"
         f'"{original_prompt}"\n\n'
         f"Responses:\n"
@@ -66,5 +146,3 @@ def validate_with_gemini(llm_results, original_prompt):
         "Please validate each response for accuracy and reasonableness. "
         "Summarize the best action and highlight any disagreements or errors."
     )
-    # Use the async Gemini call for validation as well
-    return asyncio.run(ask_gemini(validation_prompt)) 
\ No newline at end of file
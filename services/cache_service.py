@@ -0,0 +1,160 @@
+import hashlib
+import os
+import pickle
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+import orjson
+import redis.asyncio as aioredis
+from config import config
+
+_FLOAT_RE = re.compile(r"-?\d+\.\d+")
+_WS_RE = re.compile(r"\s+")
+
+class LLMResponseCache:
+    """Two-tier (memory LRU + optional pickle on disk) cache for LLM responses"""
+
+    def __init__(self, max_entries: int = 512, ttl: float = 300, disk_dir: str = ""):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self._memory = OrderedDict()
+        self._last_purge = 0.0
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self.purge_expired()
+
+    def make_key(self, prompt: str, key: Optional[tuple] = None) -> str:
+        """Hash the explicit key if given, else the prompt with floats bucketed to 2 decimals and whitespace collapsed"""
+        if key is not None:
+            return hashlib.sha256(repr(key).encode()).hexdigest()
+        normalized = _FLOAT_RE.sub(lambda m: f"{float(m.group()):.2f}", prompt)
+        normalized = _WS_RE.sub(" ", normalized).strip()
+        return hashlib.sha256(normalized.encode()).hexdigest()
+
+    def get(self, prompt: str, key: Optional[tuple] = None) -> Optional[str]:
+        """Return a cached response for the prompt, or None on miss/expiry"""
+        key = self.make_key(prompt, key)
+        entry = self._memory.get(key)
+        if entry is None and self.disk_dir:
+            entry = self._read_disk(key)
+            if entry is not None:
+                self._store_memory(key, entry)
+
+        if entry is None:
+            return None
+
+        timestamp, response = entry
+        if time.time() - timestamp > self.ttl:
+            self._memory.pop(key, None)
+            if self.disk_dir:
+                self._remove_disk(key)
+            return None
+
+        self._memory.move_to_end(key)
+        return response
+
+    def set(self, prompt: str, response: str, key: Optional[tuple] = None):
+        """Store a response for the prompt in every enabled tier"""
+        key = self.make_key(prompt, key)
+        entry = (time.time(), response)
+        self._store_memory(key, entry)
+        if self.disk_dir:
+            try:
+                with open(os.path.join(self.disk_dir, f"{key}.pkl"), "wb") as f:
+                    pickle.dump(entry, f)
+            except OSError as e:
+                print(f"Error writing LLM cache entry: {e}")
+            # Sweep the directory about once per TTL so it doesn't grow without bound
+            if time.time() - self._last_purge > self.ttl:
+                self.purge_expired()
+
+    def purge_expired(self):
+        """Drop expired entries from memory and delete expired pickle files from disk"""
+        now = time.time()
+        self._last_purge = now
+        for key in [k for k, (timestamp, _) in self._memory.items() if now - timestamp > self.ttl]:
+            del self._memory[key]
+        if not self.disk_dir:
+            return
+        try:
+            names = os.listdir(self.disk_dir)
+        except OSError as e:
+            print(f"Error listing LLM cache directory: {e}")
+            return
+        for name in names:
+            if not name.endswith(".pkl"):
+                continue
+            path = os.path.join(self.disk_dir, name)
+            try:
+                # The file is written when the entry is stored, so its mtime is the entry's age
+                if now - os.path.getmtime(path) > self.ttl:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def _remove_disk(self, key: str):
+        try:
+            os.remove(os.path.join(self.disk_dir, f"{key}.pkl"))
+        except OSError:
+            pass
+
+    def _store_memory(self, key: str, entry: tuple):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, key: str) -> Optional[tuple]:
+        path = os.path.join(self.disk_dir, f"{key}.pkl")
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        except (OSError, pickle.PickleError, EOFError):
+            return None
+
+class RedisJSONCache:
+    """JSON values in Redis shared across workers; degrades to a miss when REDIS_URL is unset or Redis is unreachable"""
+
+    def __init__(self, url: str = ""):
+        self._client = aioredis.from_url(url) if url else None
+
+    @property
+    def enabled(self) -> bool:
+        return self._client is not None
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Return the decoded value for the key, or None on miss or Redis error"""
+        if self._client is None:
+            return None
+        try:
+            raw = await self._client.get(key)
+        except Exception as e:
+            print(f"Error reading Redis cache entry {key}: {e}")
+            return None
+        return orjson.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Any, ttl: int):
+        """Store the value as JSON with a TTL in seconds; Redis errors are logged and ignored"""
+        if self._client is None:
+            return
+        try:
+            await self._client.setex(key, ttl, orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY))
+        except Exception as e:
+            print(f"Error writing Redis cache entry {key}: {e}")
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+
+# Global instances
+redis_cache = RedisJSONCache(config.REDIS_URL)
+
+llm_cache = LLMResponseCache(
+    max_entries=config.LLM_CACHE_MAX_ENTRIES,
+    ttl=config.LLM_CACHE_TTL,
+    disk_dir=config.LLM_CACHE_DIR
+)
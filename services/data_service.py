@@ -1,33 +1,80 @@
 import yfinance as yf
 import pandas as pd
 import numpy as np
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 import asyncio
+import time
 import aiohttp
 from config import config
 import ta
 
+# Per-cache entry cap; each entry is one symbol's frame, so this bounds memory under symbol churn
+FRAME_CACHE_MAX_ENTRIES = 256
+
 class DataService:
     def __init__(self):
         self.session = None
+        # (symbol, period, interval) -> (last bar key, indicator-enriched frame)
+        self._indicator_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        # (symbol, period, interval) -> (expiry, raw OHLCV frame) for chart history
+        self._history_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
     
     async def get_stock_data(self, symbol: str, period: str = "1d", interval: str = "1m") -> pd.DataFrame:
         """Get historical stock data from Yahoo Finance"""
         try:
             ticker = yf.Ticker(symbol)
-            data = ticker.history(period=period, interval=interval)
+            # yfinance blocks on network I/O; run it off the event loop so fetches can overlap
+            loop = asyncio.get_event_loop()
+            data = await loop.run_in_executor(None, lambda: ticker.history(period=period, interval=interval))
             
             if data.empty:
                 raise ValueError(f"No data found for symbol {symbol}")
             
+            # Reuse the indicators unless a new bar arrived or the live bar moved
+            key = (symbol, period, interval)
+            last_bar = (data.index[-1].value, data['Close'].iloc[-1], data['Volume'].iloc[-1])
+            cached = self._indicator_cache.get(key)
+            if cached is not None and cached[0] == last_bar and len(cached[1]) == len(data):
+                self._indicator_cache.move_to_end(key)
+                return cached[1]
+            
             # Add technical indicators
             data = self.add_technical_indicators(data)
+            self._remember(self._indicator_cache, key, (last_bar, data))
             return data
         except Exception as e:
             print(f"Error fetching data for {symbol}: {e}")
             return pd.DataFrame()
     
+    async def get_price_history(self, symbol: str, period: str = "1mo", interval: str = "1d") -> pd.DataFrame:
+        """Get raw OHLCV bars for charting, memoized for HISTORY_CACHE_TTL seconds"""
+        key = (symbol, period, interval)
+        cached = self._history_cache.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            self._history_cache.move_to_end(key)
+            return cached[1]
+        try:
+            ticker = yf.Ticker(symbol)
+            loop = asyncio.get_event_loop()
+            data = await loop.run_in_executor(None, lambda: ticker.history(period=period, interval=interval))
+        except Exception as e:
+            print(f"Error fetching history for {symbol}: {e}")
+            return pd.DataFrame()
+        data = data[['Open', 'High', 'Low', 'Close', 'Volume']] if not data.empty else data
+        # Empty answers are not memoized so a transient Yahoo failure isn't pinned
+        if not data.empty:
+            self._remember(self._history_cache, key, (time.monotonic() + config.HISTORY_CACHE_TTL, data))
+        return data
+    
+    @staticmethod
+    def _remember(cache: OrderedDict, key: tuple, value: tuple):
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > FRAME_CACHE_MAX_ENTRIES:
+            cache.popitem(last=False)
+    
     def add_technical_indicators(self, df: pd.DataFrame) -> pd.DataFrame:
         """Add technical indicators to the dataframe"""
         if df.empty:
@@ -67,7 +114,8 @@ class DataService:
         """Get real-time price data"""
         try:
             ticker = yf.Ticker(symbol)
-            info = ticker.info
+            loop = asyncio.get_event_loop()
+            info = await loop.run_in_executor(None, lambda: ticker.info)
             
             return {
                 'symbol': symbol,
@@ -93,7 +141,8 @@ class DataService:
         """Get detailed stock information"""
         try:
             ticker = yf.Ticker(symbol)
-            info = ticker.info
+            loop = asyncio.get_event_loop()
+            info = await loop.run_in_executor(None, lambda: ticker.info)
             
             return {
                 'symbol': symbol,
@@ -1,4 +1,5 @@
 import asyncio
+import time
 from typing import Dict
 from agents.technical_agent import TechnicalAgent
 from agents.sentiment_agent import SentimentAgent
@@ -14,8 +15,43 @@ class StockAnalyzer:
             'sentiment': SentimentAgent(),
             'risk': RiskManagementAgent(),
         }
+        self.analysis_cache_ttl = 60  # Reuse a symbol's analysis within the same minute
+        self._analysis_cache: Dict[tuple, Dict] = {}
+        self._inflight: Dict[tuple, asyncio.Task] = {}
 
     async def analyze(self, symbol: str, exchange: str = None) -> Dict:
+        """Analyze a single symbol, cached per symbol and time bucket"""
+        bucket = int(time.time() // self.analysis_cache_ttl)
+        key = (symbol, exchange, bucket)
+        cached = self._analysis_cache.get(key)
+        if cached is not None:
+            return cached
+
+        # Concurrent requests for the same symbol share one backend run. It is a task of its own
+        # and every caller awaits it through a shield, so a cancelled caller (e.g. a batch
+        # timeout) never cancels the run the others are waiting on.
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._analyze_and_cache(symbol, exchange, key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget_inflight(key, done))
+        return await asyncio.shield(task)
+
+    async def _analyze_and_cache(self, symbol: str, exchange: str, key: tuple) -> Dict:
+        result = await self._run_analysis(symbol, exchange)
+        if 'error' not in result:
+            # Drop entries from earlier buckets so the cache stays bounded by the symbol count
+            self._analysis_cache = {k: v for k, v in self._analysis_cache.items() if k[2] == key[2]}
+            self._analysis_cache[key] = result
+        return result
+
+    def _forget_inflight(self, key: tuple, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        # Mark a failure retrieved so it isn't logged when every caller has already gone
+        if not task.cancelled():
+            task.exception()
+
+    async def _run_analysis(self, symbol: str, exchange: str = None) -> Dict:
         """Analyze a single symbol and return signals and consensus"""
         # Map symbol for yfinance if exchange is provided
         yf_symbol = symbol
@@ -23,9 +59,11 @@ class StockAnalyzer:
             yf_symbol = map_symbol_for_yfinance(symbol, exchange)
         # Determine currency
         currency = '₹' if exchange in ['NSE', 'BSE'] else '$'
-        # Get market data
-        data = await data_service.get_stock_data(yf_symbol, period="5d", interval="1h")
-        market_data = await data_service.get_real_time_price(yf_symbol)
+        # Get market data (history and live quote are independent, so fetch them together)
+        data, market_data = await asyncio.gather(
+            data_service.get_stock_data(yf_symbol, period="5d", interval="1h"),
+            data_service.get_real_time_price(yf_symbol)
+        )
         if data.empty or not market_data:
             return {"error": f"No data available for {symbol}"}
         # Get signals from all agents concurrently
@@ -34,10 +72,12 @@ class StockAnalyzer:
             agent_tasks[agent_name] = agent.analyze(yf_symbol, data, market_data)
         agent_results = await asyncio.gather(*agent_tasks.values(), return_exceptions=True)
         signals = {}
+        signal_objects = {}
         for (agent_name, _), result in zip(agent_tasks.items(), agent_results):
             if isinstance(result, Exception):
                 signals[agent_name] = {'error': str(result)}
             else:
+                signal_objects[agent_name] = result
                 signals[agent_name] = {
                     'action': result.action,
                     'confidence': result.confidence,
@@ -45,25 +85,14 @@ class StockAnalyzer:
                     'target_price': result.target_price,
                     'stop_loss': result.stop_loss
                 }
-        # Calculate consensus
-        valid_signals = {k: v for k, v in signals.items() if 'error' not in v}
-        if valid_signals:
-            # Convert back to TradingSignal objects for consensus calculation
-            signal_objects = {}
-            for name, sig_data in valid_signals.items():
-                signal_objects[name] = TradingSignal(
-                    symbol=yf_symbol,
-                    action=sig_data['action'],
-                    confidence=sig_data['confidence'],
-                    reasoning=sig_data['reasoning'],
-                    target_price=sig_data.get('target_price'),
-                    stop_loss=sig_data.get('stop_loss')
-                )
+        # Calculate consensus from the agents' signals directly
+        if signal_objects:
             consensus = self._calculate_consensus(signal_objects)
         else:
             consensus = {'action': 'hold', 'confidence': 0.0, 'agreement': 0.0}
         return {
             'symbol': yf_symbol,
+            'exchange': exchange,
             'current_price': market_data.get('price', 0),
             'currency': currency,
             'signals': signals,